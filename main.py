@@ -1,14 +1,25 @@
+import hmac
+import logging
 import os
-from datetime import datetime
-from fastapi import FastAPI, HTTPException
+import time
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timezone
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, List, Optional, Tuple
 
-from database import db, create_document, get_documents
-from schemas import Event, Reservation, Ownerprofile, Theater, Contactmessage, Video
+from database import db, create_document, create_documents, get_documents
+from schemas import Event, EventOut, Reservation, Ownerprofile, Theater, TheaterOut, Contactmessage, Video
 
-app = FastAPI(title="Vienna Cabaret Theater API")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Vienna Cabaret Theater API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,13 +30,38 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def ensure_indexes():
+    if db is None:
+        return
+    # Open the first pooled connection now so the first user request doesn't pay the handshake.
+    # An unreachable database must not keep the app from booting; /test reports the error.
+    try:
+        await db.command("ping")
+    except Exception as e:
+        logger.warning("Database warm-up ping failed, skipping index setup: %s", e)
+        return
+    # /api/events sorts by date; the index lets Mongo return documents already ordered.
+    # A failed index build (e.g. duplicate month_key in existing data) must not stop the app from booting.
+    indexes = [
+        (EVENTS, [("date", 1)], {}),
+        (VIDEOS, [("month_key", 1)], {"unique": True}),
+        (VIDEOS, [("created_at", -1)], {}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            logger.warning("Could not create index %s on %s: %s", keys, collection.name, e)
+
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Cabaret Theater API running"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -41,7 +77,7 @@ def test_database():
             response["database_name"] = db.name
             response["connection_status"] = "Connected"
             try:
-                response["collections"] = db.list_collection_names()
+                response["collections"] = await db.list_collection_names()
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
                 response["database"] = f"⚠️ Connected but Error: {str(e)[:80]}"
@@ -58,13 +94,95 @@ def collection_name(model_cls) -> str:
     return model_cls.__name__.lower()
 
 
+def stored_fields(model_cls, doc: dict) -> dict:
+    # Stored documents were validated on write; read endpoints hand their fields straight to orjson
+    return {field: doc.get(field) for field in model_cls.model_fields}
+
+
+# Collection names and handles are static, so resolve them once at import time
+EVENT_COLL = collection_name(Event)
+RESERVATION_COLL = collection_name(Reservation)
+OWNERPROFILE_COLL = collection_name(Ownerprofile)
+THEATER_COLL = collection_name(Theater)
+CONTACTMESSAGE_COLL = collection_name(Contactmessage)
+VIDEO_COLL = collection_name(Video)
+
+EVENTS = db[EVENT_COLL] if db is not None else None
+THEATERS = db[THEATER_COLL] if db is not None else None
+VIDEOS = db[VIDEO_COLL] if db is not None else None
+
+
+# In-process response cache: key -> (expires_at epoch seconds, serialized JSON body).
+# Each worker has its own copy, so entries expire quickly instead of relying on invalidation.
+_response_cache: Dict[str, Tuple[float, bytes]] = {}
+
+RESPONSE_CACHE_TTL = 300
+
+
+def get_cached_response(key: str) -> Optional[Response]:
+    entry = _response_cache.get(key)
+    if entry is None or entry[0] <= time.time():
+        return None
+    return Response(content=entry[1], media_type="application/json")
+
+
+def cache_response(key: str, content, expires_at: Optional[float] = None) -> Response:
+    response = ORJSONResponse(content=content)
+    # Don't cache misses, so newly inserted documents show up on the next request
+    if content is not None:
+        ttl_expiry = time.time() + RESPONSE_CACHE_TTL
+        _response_cache[key] = (min(ttl_expiry, expires_at) if expires_at else ttl_expiry, response.body)
+    return response
+
+
+def clear_response_cache():
+    _response_cache.clear()
+
+
+def current_month_key() -> str:
+    # Same "YYYY-MM" as strftime("%Y-%m"), without the locale-aware formatting call
+    now = datetime.utcnow()
+    return f"{now.year:04d}-{now.month:02d}"
+
+
+def next_month_start() -> float:
+    now = datetime.now(timezone.utc)
+    if now.month == 12:
+        boundary = datetime(now.year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        boundary = datetime(now.year, now.month + 1, 1, tzinfo=timezone.utc)
+    return boundary.timestamp()
+
+
 # Events
-@app.get("/api/events", response_model=List[Event])
-def list_events():
-    docs = db[collection_name(Event)].find({}).sort("date", 1)
-    return [
-        Event(**{**d, "id": str(d.get("_id"))}) for d in docs
-    ]
+# Only the fields the response needs; timestamps and other stored extras stay on the server
+EVENT_PROJECTION = {field: 1 for field in Event.model_fields}
+EVENT_BATCH_SIZE = 200
+
+
+@app.get("/api/events", response_model=List[EventOut])
+async def list_events():
+    # Hot path: stream orjson-encoded events while the cursor is still producing them.
+    # The first batch is fetched before responding so query errors still surface as a 500.
+    cursor = EVENTS.find({}, projection=EVENT_PROJECTION).sort("date", 1).batch_size(EVENT_BATCH_SIZE)
+    first_batch = await cursor.to_list(length=EVENT_BATCH_SIZE)
+    return StreamingResponse(stream_events(first_batch, cursor), media_type="application/json")
+
+
+def encode_event(d: dict) -> bytes:
+    event = stored_fields(Event, d)
+    event["id"] = str(d["_id"])
+    return orjson.dumps(event)
+
+
+async def stream_events(first_batch: list, cursor):
+    yield b"["
+    for i, d in enumerate(first_batch):
+        yield (b"," if i else b"") + encode_event(d)
+    # Remaining documents, if any, follow a non-empty first batch
+    async for d in cursor:
+        yield b"," + encode_event(d)
+    yield b"]"
 
 
 # Reservations
@@ -73,53 +191,68 @@ class ReservationResponse(BaseModel):
     message: str
 
 
+# str(event _id) -> expiry of the last confirmation that the event exists; seat counts are never cached
+_event_exists: Dict[str, float] = {}
+
+EVENT_EXISTS_TTL = 5
+
+
+def remember_event_exists(cache_key: str, now: float):
+    # Drop expired entries so ids of past or deleted events don't accumulate
+    for key in [k for k, expires_at in _event_exists.items() if expires_at <= now]:
+        del _event_exists[key]
+    _event_exists[cache_key] = now + EVENT_EXISTS_TTL
+
+
 @app.post("/api/reservations", response_model=ReservationResponse)
-def create_reservation(res: Reservation):
-    # Check event exists and seats available, then atomically decrement
-    ev = db[collection_name(Event)].find_one({"_id": {"$eq": res.event_id}})
+async def create_reservation(res: Reservation):
     # res.event_id is str; mongo _id is ObjectId normally. For simplicity, also allow string IDs from seed.
-    # Try both string and ObjectId
-    from bson import ObjectId
-    event = None
     try:
-        event = db[collection_name(Event)].find_one({"_id": ObjectId(res.event_id)})
-    except Exception:
-        event = db[collection_name(Event)].find_one({"_id": res.event_id})
-
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    if int(event.get("seats_available", 0)) < res.tickets:
-        raise HTTPException(status_code=400, detail="Not enough seats available")
+        event_key = ObjectId(res.event_id)
+    except InvalidId:
+        event_key = res.event_id
 
-    # Decrement seats in a single operation with condition
-    from pymongo import ReturnDocument
-    updated = db[collection_name(Event)].find_one_and_update(
-        {"_id": event["_id"], "seats_available": {"$gte": res.tickets}},
+    # Check seats and decrement in a single operation with condition
+    updated = await EVENTS.find_one_and_update(
+        {"_id": event_key, "seats_available": {"$gte": res.tickets}},
         {"$inc": {"seats_available": -res.tickets}, "$set": {"updated_at": datetime.utcnow()}},
         return_document=ReturnDocument.AFTER
     )
     if not updated:
-        raise HTTPException(status_code=409, detail="Seats no longer available")
-
-    reservation_id = create_document(collection_name(Reservation), res.model_dump())
+        # Only on failure: tell a missing event apart from a sold-out one. During a ticket rush
+        # the event was usually confirmed moments ago, so skip the lookup while that is fresh.
+        cache_key = str(event_key)
+        now = time.time()
+        if _event_exists.get(cache_key, 0) > now:
+            raise HTTPException(status_code=409, detail="Not enough seats available")
+        if await EVENTS.find_one({"_id": event_key}, projection={"_id": 1}) is None:
+            _event_exists.pop(cache_key, None)
+            raise HTTPException(status_code=404, detail="Event not found")
+        remember_event_exists(cache_key, now)
+        raise HTTPException(status_code=409, detail="Not enough seats available")
+
+    reservation_id = await create_document(RESERVATION_COLL, res.model_dump())
     return {"reservation_id": reservation_id, "message": "Reservation confirmed"}
 
 
 # Owners
 @app.get("/api/owners", response_model=List[Ownerprofile])
-def list_owners():
-    docs = get_documents(collection_name(Ownerprofile))
-    return [Ownerprofile(**{k: v for k, v in d.items() if k != "_id"}) for d in docs]
+async def list_owners():
+    docs = await get_documents(OWNERPROFILE_COLL)
+    return ORJSONResponse(content=[stored_fields(Ownerprofile, d) for d in docs])
 
 
 # Theater info (latest document)
-@app.get("/api/theater", response_model=Optional[Theater])
-def theater_info():
-    doc = db[collection_name(Theater)].find_one(sort=[("created_at", -1)])
-    if not doc:
-        return None
-    return Theater(**{k: v for k, v in doc.items() if k != "_id"})
+@app.get("/api/theater", response_model=Optional[TheaterOut])
+async def theater_info():
+    cached = get_cached_response("theater")
+    if cached is not None:
+        return cached
+    doc = await THEATERS.find_one(sort=[("created_at", -1)])
+    theater = None
+    if doc:
+        theater = stored_fields(TheaterOut, doc)
+    return cache_response("theater", theater)
 
 
 # Contact message
@@ -129,58 +262,122 @@ class ContactResponse(BaseModel):
 
 
 @app.post("/api/contact", response_model=ContactResponse)
-def send_message(msg: Contactmessage):
-    mid = create_document(collection_name(Contactmessage), msg)
+async def send_message(msg: Contactmessage):
+    mid = await create_document(CONTACTMESSAGE_COLL, msg.model_dump(mode="python"))
     return {"message_id": mid, "message": "Thanks for reaching out!"}
 
 
 # Video background
 @app.get("/api/video/current", response_model=Optional[Video])
-def current_video():
-    key = datetime.utcnow().strftime("%Y-%m")
-    doc = db[collection_name(Video)].find_one({"month_key": key})
-    if not doc:
-        # Fallback: the most recent video
-        doc = db[collection_name(Video)].find_one(sort=[("created_at", -1)])
-    if not doc:
-        return None
-    return Video(**{k: v for k, v in doc.items() if k != "_id"})
+async def current_video():
+    cached = get_cached_response("video:current")
+    if cached is not None:
+        return cached
+    key = current_month_key()
+    # One round-trip: this month's video (month_key index) unioned with the most recent video
+    # as fallback (created_at index); the final sort only sees at most two documents.
+    # $unionWith requires MongoDB 4.4+.
+    pipeline = [
+        {"$match": {"month_key": key}},
+        {"$limit": 1},
+        {"$set": {"_rank": 0}},
+        {"$unionWith": {
+            "coll": VIDEO_COLL,
+            "pipeline": [{"$sort": {"created_at": -1}}, {"$limit": 1}, {"$set": {"_rank": 1}}],
+        }},
+        {"$sort": {"_rank": 1}},
+        {"$limit": 1},
+    ]
+    docs = await VIDEOS.aggregate(pipeline).to_list(length=1)
+    doc = docs[0] if docs else None
+    video = None
+    if doc:
+        video = stored_fields(Video, doc)
+    # Never serve last month's video past the month boundary
+    return cache_response("video:current", video, next_month_start())
 
 
 @app.get("/api/video/{month_key}", response_model=Optional[Video])
-def video_by_month(month_key: str):
-    doc = db[collection_name(Video)].find_one({"month_key": month_key})
+async def video_by_month(month_key: str):
+    doc = await VIDEOS.find_one({"month_key": month_key})
     if not doc:
-        return None
-    return Video(**{k: v for k, v in doc.items() if k != "_id"})
+        return ORJSONResponse(content=None)
+    return ORJSONResponse(content=stored_fields(Video, doc))
 
 
 # Optional: seed endpoint to populate demo content
+META_COLL = "meta"
+META = db[META_COLL] if db is not None else None
+
+SEED_MARKER_ID = "seeded"
+_seeded = False
+_seed_disabled_logged = False
+
+
 @app.post("/api/seed")
-def seed():
+async def seed(x_seed_token: Optional[str] = Header(None)):
     """Populate the database with sample data for preview."""
-    # Only seed if empty
-    if db[collection_name(Event)].estimated_document_count() > 0:
+    global _seeded, _seed_disabled_logged
+    # Only callers presenting SEED_TOKEN may seed; without one configured, seeding is disabled
+    seed_token = os.getenv("SEED_TOKEN")
+    if not seed_token:
+        if not _seed_disabled_logged:
+            logger.warning("Refusing to seed: SEED_TOKEN is not configured")
+            _seed_disabled_logged = True
+        raise HTTPException(status_code=403, detail="Seeding is disabled")
+    if not hmac.compare_digest((x_seed_token or "").encode(), seed_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid seed token")
+
+    # Only seed once: process-local flag first, then claim the marker document before inserting
+    # anything, so concurrent first calls can't both seed
+    if _seeded:
+        return {"status": "ok", "message": "Already seeded"}
+    try:
+        await META.insert_one({"_id": SEED_MARKER_ID, "at": datetime.utcnow()})
+    except DuplicateKeyError:
+        _seeded = True
         return {"status": "ok", "message": "Already seeded"}
+    _seeded = True
+
+    documents = demo_documents()
+    try:
+        # Databases seeded before the marker existed
+        if await EVENTS.estimated_document_count() > 0:
+            return {"status": "ok", "message": "Already seeded"}
+        for coll, docs in documents.items():
+            await create_documents(coll, docs)
+    except Exception:
+        # Remove whatever was inserted and release the claim so a later call can retry cleanly
+        try:
+            for coll, docs in documents.items():
+                await db[coll].delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+            await META.delete_one({"_id": SEED_MARKER_ID})
+        except Exception as e:
+            logger.warning("Could not roll back failed seed: %s", e)
+        _seeded = False
+        raise
+
+    clear_response_cache()
+    return {"status": "ok", "message": "Seeded demo data"}
+
 
+def demo_documents() -> Dict[str, List[dict]]:
+    """Build the demo theater, owners, events and current-month video, keyed by collection."""
     # Theater
-    create_document(
-        collection_name(Theater),
-        Theater(
-            name="Kabarett Salon am Kanal",
-            tagline="Quirky. Wien. Mit Schmäh.",
-            story=(
-                "Geboren aus dem Geist der Kaffeehauskultur, lebt unser kleines Kabarett die große Liebe "
-                "zum spontanen Wort. Zwischen Samtvorhängen und Messinglampen trifft moderner Humor auf "
-                "den Charme vergangener Nächte."
-            ),
-            address="Schwarzer-Bären-Gasse 12, 1050 Wien",
-            phone="+43 1 234 56 78",
-            email="kontakt@kabarett-salon.at",
-            opening_hours="Di–So ab 18:00",
-            transport_howto="U4 bis Kettenbrückengasse, dann 5 Minuten zu Fuß"
-        )
-    )
+    theater = Theater(
+        name="Kabarett Salon am Kanal",
+        tagline="Quirky. Wien. Mit Schmäh.",
+        story=(
+            "Geboren aus dem Geist der Kaffeehauskultur, lebt unser kleines Kabarett die große Liebe "
+            "zum spontanen Wort. Zwischen Samtvorhängen und Messinglampen trifft moderner Humor auf "
+            "den Charme vergangener Nächte."
+        ),
+        address="Schwarzer-Bären-Gasse 12, 1050 Wien",
+        phone="+43 1 234 56 78",
+        email="kontakt@kabarett-salon.at",
+        opening_hours="Di–So ab 18:00",
+        transport_howto="U4 bis Kettenbrückengasse, dann 5 Minuten zu Fuß"
+    ).model_dump(mode="python")
 
     # Owners
     owners = [
@@ -201,8 +398,6 @@ def seed():
             website="https://miloberger.example.com",
         ),
     ]
-    for o in owners:
-        create_document(collection_name(Ownerprofile), o)
 
     # Events (next days)
     base_date = datetime.utcnow()
@@ -241,23 +436,31 @@ def seed():
             image_url="https://images.unsplash.com/photo-1496307042754-b4aa456c4a2d?w=1200&auto=format&fit=crop&q=60"
         ),
     ]
-    for e in demo_events:
-        create_document(collection_name(Event), e)
 
     # Video for current month
-    create_document(
-        collection_name(Video),
-        Video(
-            month_key=datetime.utcnow().strftime("%Y-%m"),
-            video_url="https://cdn.coverr.co/videos/coverr-theatre-actors-having-fun-0044/1080p.mp4",
-            caption="Aus dem aktuellen Programm"
-        )
-    )
-
-    return {"status": "ok", "message": "Seeded demo data"}
+    video = Video(
+        month_key=current_month_key(),
+        video_url="https://cdn.coverr.co/videos/coverr-theatre-actors-having-fun-0044/1080p.mp4",
+        caption="Aus dem aktuellen Programm"
+    ).model_dump(mode="python")
+
+    documents = {
+        THEATER_COLL: [theater],
+        OWNERPROFILE_COLL: [o.model_dump(mode="python") for o in owners],
+        EVENT_COLL: [e.model_dump(mode="python") for e in demo_events],
+        VIDEO_COLL: [video],
+    }
+    # Assign ids up front so a partially failed seed can be rolled back precisely
+    for docs in documents.values():
+        for doc in docs:
+            doc["_id"] = ObjectId()
+    return documents
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Async workers: one per core is enough, and each one holds its own Mongo pool and caches.
+    # WEB_CONCURRENCY overrides.
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, loop="uvloop", http="httptools")
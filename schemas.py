@@ -55,3 +55,11 @@ class Video(BaseModel):
     month_key: str = Field(..., description="Format YYYY-MM identifying the month")
     video_url: str = Field(..., description="Public video URL to show in background")
     caption: Optional[str] = None
+
+# Response schemas
+
+class TheaterOut(Theater):
+    email: str
+
+class EventOut(Event):
+    id: str = Field(..., description="Event document ID, used as event_id when reserving")